@@ -0,0 +1,30 @@
+import pandas as pd
+
+# Cohort cube, built while scoring claims and read by the Cohort Dashboard page:
+# beneficiary counts and sums of scores by discharge month x risk band x acuity x comorbidity category.
+# A beneficiary with several comorbidities is counted once per category, and once more under COHORT_CUBE_ALL.
+COHORT_CUBE_DIMENSIONS = ["Discharge Month", "30-Day Readmission Risk", "Admission Is Acute", "Comorbidity"]
+COHORT_CUBE_MEASURES = ["Beneficiaries", "LACE Score Sum", "Comorbidity Index Sum", "Previous Emergency Dept Use Sum"]
+COHORT_CUBE_ALL = "All"
+COHORT_CUBE_NO_COMORBIDITY = "None"
+
+def build_cohort_cube(beneficiaries_):
+    """
+    Inputs: beneficiaries_ <- contains the information about each patient, based on the claims file and the processing of it
+    Outputs: cube <- dataframe with one row per (COHORT_CUBE_DIMENSIONS) cell and the COHORT_CUBE_MEASURES for that cell
+    """
+    cells = dict()
+    for entry in beneficiaries_.values():
+        month = entry["discharge_date"].strftime("%Y-%m")
+        categories = entry["comorbidities"] if entry["comorbidities"] else [COHORT_CUBE_NO_COMORBIDITY]
+        for category in [COHORT_CUBE_ALL] + list(categories):
+            key = (month, entry["readmission_risk"], bool(entry["acuity"]), category)
+            if key not in cells:
+                cells[key] = [0, 0, 0, 0]
+            cell = cells[key]
+            cell[0] += 1
+            cell[1] += entry["LACE_score"]
+            cell[2] += entry["charlson_score"]
+            cell[3] += entry["emergency_dept_use"]
+    cube = pd.DataFrame([list(key) + cell for key, cell in cells.items()], columns=COHORT_CUBE_DIMENSIONS + COHORT_CUBE_MEASURES)
+    return cube
@@ -0,0 +1,207 @@
+import argparse
+import importlib.util
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+import pandas as pd
+
+# Differential test of the scoring engines of the claims page: runs the reference and the fast engine on the same
+# claims (generated and/or real), reports every beneficiary whose results differ, and measures the speedup.
+# Exits with status 1 if the engines disagree, so it can be run before turning the fast engine on in production.
+
+CLAIMS_PAGE = "pages/Calculate_LACE_from_Claims_Data.py"
+
+# Codes for every comorbidity category (and a few without one), so the generated claims exercise the severity priorities
+ICD_CODES = ["I214", "I5020", "I739", "G459", "E119", "E1122", "J449", "K7030", "N184", "C509", "M329", "F0390",
+             "N186", "K766", "B20", "A150", "C787", "K259", "G8110", "I10", "Z0000", "R69"]
+REV_CNTR_CODES = [450, 451, 459, 981, 100, 120, 250, 300]
+HCPCS_CODES = ["99281", "99283", "99285", "99291", "36415", "85025"]
+DISCHARGE_STATUSES = [1, 1, 1, 1, 6, 30, 5, 20]
+# Fields left blank (NaN) on some lines of the files generated with a blank rate
+BLANK_FIELDS = ["BENE_ID", "CLM_IP_ADMSN_TYPE_CD", "REV_CNTR", "HCPCS_CD", "CLM_ADMSN_DT", "NCH_BENE_DSCHRG_DT",
+                "PTNT_DSCHRG_STUS_CD", "Previous Emergency Dept Use (Past 6 Months)"]
+# A blank date fails both engines on any line, so some files leave the dates filled in to get more of them scored
+DATE_FIELDS = ["CLM_ADMSN_DT", "NCH_BENE_DSCHRG_DT"]
+
+def load_claims_page():
+    """
+    Import the claims page as a module (it lives in pages/ and its file name isn't a valid module path).
+    """
+    spec = importlib.util.spec_from_file_location("claims_page", CLAIMS_PAGE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def generate_claims(n_beneficiaries, seed=0, blank_rate=0.0, blank_fields=BLANK_FIELDS):
+    """
+    Generate claim lines covering the edge cases of the reference engine: several claims per beneficiary in any order,
+    same-day admissions, expired/still a patient/transferred statuses and several lines per claim.
+    Each of the blank_fields is left blank on a line with probability blank_rate.
+    """
+    rng = random.Random(seed)
+    start = datetime(2020, 1, 1)
+    lines = []
+    for bene in range(n_beneficiaries):
+        bene_id = 10000000 + bene
+        ed_visits = rng.randint(0, 6)
+        n_claims = rng.randint(1, 4)
+        admissions = [start + timedelta(days=rng.randint(0, 365)) for i in range(n_claims)]
+        if n_claims > 1 and rng.random() < 0.3:
+            admissions[-1] = admissions[0] # Same-day admission
+        for claim, admission in enumerate(admissions):
+            discharge = admission + timedelta(days=rng.randint(0, 20))
+            status = rng.choice(DISCHARGE_STATUSES)
+            codes = rng.sample(ICD_CODES, rng.randint(0, 5))
+            for line in range(rng.randint(1, 4)):
+                entry = {
+                    "BENE_ID": bene_id,
+                    "CLM_ID": bene_id * 10 + claim,
+                    "CLM_IP_ADMSN_TYPE_CD": rng.choice([1, 2, 3, 5]),
+                    "REV_CNTR": rng.choice(REV_CNTR_CODES),
+                    "CLM_ADMSN_DT": admission.strftime('%d-%b-%Y'),
+                    "NCH_BENE_DSCHRG_DT": discharge.strftime('%d-%b-%Y'),
+                    "PTNT_DSCHRG_STUS_CD": status,
+                    "PRNCPAL_DGNS_CD": codes[0] if codes else None,
+                    "HCPCS_CD": rng.choice(HCPCS_CODES),
+                    "Previous Emergency Dept Use (Past 6 Months)": ed_visits,
+                }
+                for i in range(1, 26):
+                    entry["ICD_DGNS_CD" + str(i)] = codes[i] if i < len(codes) else None
+                for field in blank_fields:
+                    if rng.random() < blank_rate:
+                        entry[field] = float("nan")
+                lines.append(entry)
+    # Claims files aren't sorted by admission date, and lines of different beneficiaries are interleaved
+    rng.shuffle(lines)
+    return pd.DataFrame(lines)
+
+def normalize_entry(entry):
+    entry = dict(entry)
+    entry["comorbidities"] = sorted(entry["comorbidities"])
+    return entry
+
+def normalize_keys(beneficiaries):
+    """
+    Blank BENE_IDs (NaN) are all different keys, which never compare equal; name them by their rank instead.
+    """
+    normalized = dict()
+    blanks = 0
+    for bene_id, entry in beneficiaries.items():
+        if bene_id != bene_id:
+            blanks += 1
+            bene_id = "blank BENE_ID #" + str(blanks)
+        normalized[bene_id] = entry
+    return normalized
+
+def compare_beneficiaries(reference, fast):
+    """
+    Inputs: reference, fast <- dictionaries of BENE_ID -> entry returned by the two engines
+    Outputs: list of (BENE_ID, field, reference value, fast value) for every difference
+    """
+    reference, fast = normalize_keys(reference), normalize_keys(fast)
+    mismatches = []
+    for bene_id in reference:
+        if bene_id not in fast:
+            mismatches.append((bene_id, "beneficiary", "present", "missing"))
+    for bene_id in fast:
+        if bene_id not in reference:
+            mismatches.append((bene_id, "beneficiary", "missing", "present"))
+    if [bene_id for bene_id in reference if bene_id in fast] != [bene_id for bene_id in fast if bene_id in reference]:
+        mismatches.append((None, "order", list(reference), list(fast)))
+    for bene_id, reference_entry in reference.items():
+        if bene_id not in fast:
+            continue
+        reference_entry, fast_entry = normalize_entry(reference_entry), normalize_entry(fast[bene_id])
+        for field in reference_entry.keys() | fast_entry.keys():
+            if reference_entry.get(field) != fast_entry.get(field):
+                mismatches.append((bene_id, field, reference_entry.get(field), fast_entry.get(field)))
+    return mismatches
+
+def time_engine(claims_page, df, engine, repeat):
+    """
+    Run an engine `repeat` times and return its result (or the exception it raised) and best time in seconds.
+    """
+    best = None
+    for i in range(repeat):
+        initial_time = time.perf_counter()
+        try:
+            beneficiaries = claims_page.score_beneficiaries(df, engine)
+        except Exception as e:
+            return e, None
+        elapsed = time.perf_counter() - initial_time
+        best = elapsed if best is None else min(best, elapsed)
+    return beneficiaries, best
+
+def describe_result(result):
+    if isinstance(result, Exception):
+        return "raised " + type(result).__name__ + ": " + str(result)
+    return "returned " + str(len(result)) + " beneficiaries"
+
+def compare_engines(claims_page, df, label, repeat=1, verbose=True):
+    """
+    Run both engines on df, print the report (only if there are mismatches when verbose is False)
+    and return (mismatches, whether the engines rejected the file).
+    Both engines must either reject the file or return the same beneficiaries.
+    """
+    reference, reference_time = time_engine(claims_page, df, "reference", repeat)
+    fast, fast_time = time_engine(claims_page, df, "fast", repeat)
+    rejected = isinstance(reference, Exception) and isinstance(fast, Exception)
+    if isinstance(reference, Exception) or isinstance(fast, Exception):
+        mismatches = [] if rejected else [(None, "result", describe_result(reference), describe_result(fast))]
+    else:
+        mismatches = compare_beneficiaries(reference, fast)
+    if not verbose and not mismatches:
+        return mismatches, rejected
+
+    print(label + ": " + str(len(df)) + " claim lines")
+    if reference_time is not None and fast_time is not None:
+        print("  " + str(len(reference)) + " beneficiaries")
+        print("  reference engine: %.3f s" % reference_time)
+        print("  fast engine:      %.3f s (%.1fx faster)" % (fast_time, reference_time / fast_time if fast_time > 0 else float("inf")))
+    else:
+        print("  reference engine " + describe_result(reference))
+        print("  fast engine " + describe_result(fast))
+    if mismatches:
+        print("  " + str(len(mismatches)) + " mismatches:")
+        for bene_id, field, reference_value, fast_value in mismatches:
+            print("    BENE_ID " + str(bene_id) + ", " + field + ": reference=" + repr(reference_value) + " fast=" + repr(fast_value))
+    else:
+        print("  no mismatches")
+    return mismatches, rejected
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that the fast scoring engine agrees with the reference engine, and measure the speedup.")
+    parser.add_argument("claims", nargs="*", help="Pipe-separated Medicare claims files to compare the engines on")
+    parser.add_argument("--beneficiaries", type=int, default=2000, help="Number of beneficiaries in the generated claims (0 to skip)")
+    parser.add_argument("--seeds", type=int, default=3, help="Number of generated claims files")
+    parser.add_argument("--blank-files", type=int, default=200, help="Number of small generated claims files with blank fields")
+    parser.add_argument("--blank-rate", type=float, default=0.01, help="Probability of each blank field on a line of those files")
+    parser.add_argument("--repeat", type=int, default=1, help="Number of timed runs of each engine (the best one is reported)")
+    args = parser.parse_args()
+
+    claims_page = load_claims_page()
+    mismatches = []
+    if args.beneficiaries > 0:
+        for seed in range(args.seeds):
+            df = generate_claims(args.beneficiaries, seed)
+            mismatches += compare_engines(claims_page, df, "Generated claims (seed " + str(seed) + ")", args.repeat)[0]
+    # Small files, so that some of them are accepted and others rejected by the engines
+    for label, blank_fields in [("blank fields", BLANK_FIELDS),
+                                ("blank fields except dates", [field for field in BLANK_FIELDS if field not in DATE_FIELDS])]:
+        rejected = 0
+        for seed in range(args.blank_files):
+            df = generate_claims(10, seed, args.blank_rate, blank_fields)
+            file_mismatches, file_rejected = compare_engines(claims_page, df, "Generated claims with " + label + " (seed " + str(seed) + ")", verbose=False)
+            mismatches += file_mismatches
+            rejected += file_rejected
+        if args.blank_files > 0:
+            print("Generated claims with " + label + ": " + str(args.blank_files) + " files, " + str(rejected) + " rejected by both engines")
+    for path in args.claims:
+        df = pd.read_csv(path, sep="|", low_memory = False)
+        df = claims_page.select_claims_columns(df)
+        mismatches += compare_engines(claims_page, df, path, args.repeat)[0]
+    sys.exit(1 if mismatches else 0)
+
+if __name__ == "__main__":
+    main()
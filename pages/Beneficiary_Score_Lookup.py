@@ -0,0 +1,61 @@
+import streamlit as st
+from datetime import date, timedelta
+from score_store import get_beneficiary, query_scores
+
+RISK_LEVELS = ["LOW", "INTERMEDIATE", "HIGH"]
+MAX_LACE_SCORE = 19
+
+def lookup_beneficiary():
+    """
+    Point lookup: current LACE score and comorbidities of one beneficiary.
+    """
+    st.subheader("Look up a beneficiary")
+    bene_id = st.text_input("Beneficiary ID", help="BENE_ID from the claims file")
+    if not bene_id:
+        return
+    df = get_beneficiary(bene_id.strip())
+    if len(df) == 0:
+        st.warning("Beneficiary " + bene_id + " is not in the score store yet. Score a claims file containing this beneficiary first.")
+        return
+    row = df.iloc[0]
+    col1, col2, col3 = st.columns(3)
+    col1.metric("LACE Score", int(row["LACE Score"]))
+    col2.metric("30-Day Readmission Risk", row["30-Day Readmission Risk"])
+    col3.metric("Comorbidity Index", int(row["Comorbidity Index"]))
+    st.markdown(
+    f"- **Discharge Date:** {row['Discharge Date']}\n"
+    f"- **Admission Is Acute:** {'Yes' if row['Admission Is Acute'] else 'No'}\n"
+    f"- **Previous Emergency Dept Use (Past 6 Months):** {int(row['Previous Emergency Dept Use (Past 6 Months)'])}\n"
+    f"- **Comorbidities:** {', '.join(row['Comorbidities']) if row['Comorbidities'] else 'None'}\n"
+    f"- **Last Updated:** {row['Updated At']}"
+    )
+
+def search_discharges():
+    """
+    Range query: beneficiaries by risk level, discharge date and LACE score.
+    """
+    st.subheader("Search discharges")
+    risk_levels = st.multiselect("30-Day Readmission Risk", RISK_LEVELS, default=["HIGH"])
+    today = date.today()
+    dates = st.date_input("Discharge dates", value=(today - timedelta(days=today.weekday()), today))
+    lace_range = st.slider("LACE Score", min_value=0, max_value=MAX_LACE_SCORE, value=(0, MAX_LACE_SCORE))
+
+    # The date input returns a single date while the user is still picking the end of the range
+    discharged_from = dates[0] if len(dates) > 0 else None
+    discharged_to = dates[1] if len(dates) > 1 else discharged_from
+    df = query_scores(risk_levels=risk_levels, discharged_from=discharged_from, discharged_to=discharged_to,
+                      min_lace=lace_range[0], max_lace=lace_range[1])
+    st.write(str(len(df)) + " beneficiaries found.")
+    st.dataframe(df)
+
+def main():
+    st.title("Beneficiary Score Lookup")
+    st.markdown(
+    "Look up the latest LACE scores saved from the claims files scored on the **Calculate LACE from Claims Data** page, "
+    "without re-uploading or rescoring them. Each beneficiary keeps the score of their latest discharge."
+    )
+    lookup_beneficiary()
+    search_discharges()
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,38 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.feather as feather
 from datetime import datetime
+from functools import lru_cache
+import numbers
+import os
+import tempfile
 import time
 import logging
 from io import StringIO
+from score_store import upsert_scores
+from cohort_cube import build_cohort_cube
 logging.basicConfig(filename='log.txt', encoding='utf-8', level=logging.DEBUG)
 
 EMERGENCY = True
 NOT_EMERGENCY = False
 PATIENT_DISCHARGE_STATUS_CODES = {"Still a patient": 30, "Transferred to other inpatient hospital": 5, "Expired": 20}
 
+# Datasets registered for warm start: name -> pipe-separated claims file they are built from.
+# Each one is converted once into Arrow (Feather) files under WARM_START_DIR, together with its scored result and cohort cube.
+WARM_START_DIR = "warm_start"
+WARM_START_DATASETS = {"inpatient78059": "inpatient78059.csv"}
+WARM_START_ARTIFACTS = ["scored", "cube"]
+# Bump when the layout of the artifacts changes, so files built by an older version are not reused
+WARM_START_VERSION = 2
+EXAMPLE_DATASET = "inpatient78059"
+
+# Scoring engines: "reference" processes the claims row by row and defines the expected results;
+# "fast" must give the same results (checked with compare_engines.py). Selected with the LACE_SCORING_ENGINE environment variable.
+SCORING_ENGINES = ["reference", "fast"]
+SCORING_ENGINE = os.environ.get("LACE_SCORING_ENGINE", "reference")
+
 
 # TODO: Inpatient vs outpatient identification (easy way: los < 1) | Low-Med
 
@@ -17,35 +40,115 @@ PATIENT_DISCHARGE_STATUS_CODES = {"Still a patient": 30, "Transferred to other i
 def upload_and_process_file():
     """
     Upload the user specified file (CSV only for now) and return a pandas dataframe. Currently only handles single file uploads.
+    Returns (claims dataframe, None) for uploads and (None, name of the warm start dataset) for the pre-built example file.
     """
 
     # TODO Generalize this to different file types and separators
 
-    columns_to_use = ["BENE_ID", "CLM_ID", "CLM_IP_ADMSN_TYPE_CD", "REV_CNTR", "CLM_ADMSN_DT", 
-                      "NCH_BENE_DSCHRG_DT", "PTNT_DSCHRG_STUS_CD", "PRNCPAL_DGNS_CD", "HCPCS_CD", "Previous Emergency Dept Use (Past 6 Months)"]
-    icd_cols = ["ICD_DGNS_CD" + str(i) for i in range(1, 26)]
-    columns_to_use += icd_cols
-    
     help = 'The file must have the following columms: "BENE_ID", "CLM_ID", "REV_CNTR", "CLM_ADMSN_DT", \
             "NCH_BENE_DSCHRG_DT", "PTNT_DSCHRG_STUS_CD", "PRNCPAL_DGNS_CD", "HCPCS_CD", and "Previous Emergency Dept Use (Past 6 Months)".'
 
     file = st.file_uploader("Upload medicare fee-for-service claim file:", accept_multiple_files=False, type=".csv", key="claims_upload", help=help)
     try_example = st.button("Try an example file", help="Source of file: https://data.cms.gov/sites/default/files/2023-04/67157de9-d962-4af0-bf0e-3578b3afec58/inpatient.csv")
     if try_example:
-        # Use the example inpatient medicare fee-for-service claim file.
-        df = pd.read_csv("inpatient78059.csv", sep="|", low_memory = False)
+        # Use the pre-built example inpatient medicare fee-for-service claim file (already scored).
+        return None, EXAMPLE_DATASET
     elif file is not None:
         # Use the user-uploaded file.
         df = pd.read_csv(file, sep="|", low_memory = False)
     else:
         exit(3)
 
+    return select_claims_columns(df), None
+
+def select_claims_columns(df):
+    """
+    Keep only the claims columns used for LACE scoring (the ones that are present in df).
+    """
+    columns_to_use = ["BENE_ID", "CLM_ID", "CLM_IP_ADMSN_TYPE_CD", "REV_CNTR", "CLM_ADMSN_DT", 
+                      "NCH_BENE_DSCHRG_DT", "PTNT_DSCHRG_STUS_CD", "PRNCPAL_DGNS_CD", "HCPCS_CD", "Previous Emergency Dept Use (Past 6 Months)"]
+    columns_to_use += ["ICD_DGNS_CD" + str(i) for i in range(1, 26)]
+
     # Filter the DataFrame based on available columns
     available_columns = df.columns
     columns_to_use = [col for col in columns_to_use if col in available_columns]
-    df = df[columns_to_use]
+    return df[columns_to_use]
+
+# Warm start: registered datasets are stored as Arrow files and memory-mapped instead of re-read and rescored
+def warm_start_paths(name):
+    """
+    Input: name of a dataset registered in WARM_START_DATASETS
+    Output: paths of its Arrow files, keyed by artifact ("scored", "cube")
+    """
+    return {artifact: os.path.join(WARM_START_DIR, name + "_" + artifact + "_v" + str(WARM_START_VERSION) + ".arrow")
+            for artifact in WARM_START_ARTIFACTS}
+
+def warm_start_is_stale(name):
+    """
+    The Arrow files need to be (re)built if one is missing or if the source claims file has changed since they were built.
+    """
+    source_path = WARM_START_DATASETS[name]
+    for path in warm_start_paths(name).values():
+        if not os.path.exists(path):
+            return True
+        if os.path.exists(source_path) and os.path.getmtime(path) < os.path.getmtime(source_path):
+            return True
+    return False
+
+def build_warm_start_dataset(name):
+    """
+    Read the registered claims file once, score it, and store the scored result and cohort cube
+    as uncompressed Arrow (Feather v2) files so they can be memory-mapped.
+    The files are written to temporary files first and then moved into place, so an interrupted or concurrent build
+    never leaves a truncated file that would look up to date.
+    """
+    paths = warm_start_paths(name)
+    os.makedirs(WARM_START_DIR, exist_ok=True)
+    df = pd.read_csv(WARM_START_DATASETS[name], sep="|", low_memory = False)
+    df = select_claims_columns(df).reset_index(drop=True)
+    df_new, cube = process_dataframe(df)
+
+    tmp_paths = dict()
+    try:
+        for artifact, df_artifact in [("scored", df_new), ("cube", cube)]:
+            fd, tmp_paths[artifact] = tempfile.mkstemp(dir=WARM_START_DIR, suffix=".arrow.tmp")
+            os.close(fd)
+            feather.write_feather(df_artifact, tmp_paths[artifact], compression="uncompressed")
+        for artifact, tmp_path in tmp_paths.items():
+            os.replace(tmp_path, paths[artifact])
+    finally:
+        for tmp_path in tmp_paths.values():
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    logging.info("Built warm start dataset " + name)
+
+def load_warm_start_dataset(name, artifact="scored"):
+    """
+    Input: name of a dataset registered in WARM_START_DATASETS; artifact <- one of WARM_START_ARTIFACTS
+    Output: dataframe backed by the memory-mapped Arrow file (built first, or rebuilt if the source claims file changed).
+    Each call returns a new dataframe, with the same dtypes as the one that was written, so callers can modify it freely.
+    """
+    if warm_start_is_stale(name):
+        build_warm_start_dataset(name)
+    path = warm_start_paths(name)[artifact]
+    table = map_warm_start_artifact(path, os.path.getmtime(path))
+    # split_blocks avoids consolidating columns into new 2D blocks, so numeric columns stay zero-copy (read-only) views of the mapping.
+    df = table.to_pandas(split_blocks=True)
+    # Arrow list columns (e.g. Comorbidities) come back as numpy arrays
+    for field in table.schema:
+        if pa.types.is_list(field.type):
+            df[field.name] = df[field.name].map(list)
     return df
 
+@st.cache_resource
+def map_warm_start_artifact(path, mtime):
+    """
+    Memory-map an Arrow file. Cached as a resource so Streamlit reruns reuse the same mapping instead of reloading it;
+    mtime is only part of the cache key, so a rebuilt file gets mapped again.
+    Returns the (immutable) Arrow table, which is shared by every session.
+    """
+    return feather.read_table(path, memory_map=True)
+
 # Calculate length of stay
 def length_of_stay(df_row):
     """
@@ -157,9 +260,9 @@ def get_charlson_comorbidity(icd_10_code):
                     conditions.append(comorbidity)
     return conditions
 
-def get_all_charlson_comorbidities(df_row):
+def get_all_charlson_comorbidities(df_row, charlson_lookup=get_charlson_comorbidity):
     """
-    Input <- row from inpatient medicare claims file.
+    Input <- row from inpatient medicare claims file; charlson_lookup <- function mapping one ICD 10 code to its comorbidities
     output <- list of patient's charlson's comorbidities
     """
     comorbidity_columns = ["PRNCPAL_DGNS_CD"] 
@@ -172,7 +275,7 @@ def get_all_charlson_comorbidities(df_row):
             # logging.info("Column" + str(col) + "doesn't exist in dataframe")
             # Log code doesn't exist
             continue
-        comorbidity = get_charlson_comorbidity(code)
+        comorbidity = charlson_lookup(code)
         charlson_comorbidities += list(comorbidity)
     charlson_comorbidities = set(charlson_comorbidities)
         
@@ -271,7 +374,7 @@ def interpret_lace_score(lace_score):
     else:
         return "HIGH"
 
-def process_row(row):
+def process_row(row, charlson_lookup=get_charlson_comorbidity):
     """
     Processes a row of a medicare claims file and outputs an entry consisting of that processed information
     """
@@ -279,7 +382,7 @@ def process_row(row):
     admsn_date, dschrg_date = datetime.strptime(admsn_date, '%d-%b-%Y'), datetime.strptime(dschrg_date, '%d-%b-%Y')
     los = length_of_stay(row)
     acuity = acuity_of_admission(row)
-    comorbidities = get_all_charlson_comorbidities(row)
+    comorbidities = get_all_charlson_comorbidities(row, charlson_lookup)
     charlson_score = get_comorbidity_index_from_disease_list(comorbidities)
     emergency_dept_use = int(row["Previous Emergency Dept Use (Past 6 Months)"])
     lace_score = calculate_lace_score(los, acuity, charlson_score, emergency_dept_use)
@@ -311,7 +414,7 @@ def convert_beneficiary_info_to_dataframe(beneficiaries_):
     df.columns = ['Beneficiary ID', 'Admission Date', 'Discharge Status', 'Discharge Date', "LACE Score", "30-Day Readmission Risk", "Length of Stay (Days)", 
                   "Admission Is Acute", "Comorbidities", "Comorbidity Index", "Previous Emergency Dept Use (Past 6 Months)"]
     df = df[['Beneficiary ID', 'LACE Score', "30-Day Readmission Risk", "Admission Is Acute", "Comorbidity Index", 
-             "Previous Emergency Dept Use (Past 6 Months)", "Comorbidities"]] 
+             "Previous Emergency Dept Use (Past 6 Months)", "Discharge Date", "Comorbidities"]] 
     return df
 
 
@@ -345,9 +448,11 @@ def display_beneficiaries_dataframe(df):
     # st.dataframe(df.style.apply(highlight_rows, axis=1))
     st.dataframe(df)
 
-@st.cache_data
-def process_dataframe(df):
-    nrows = len(df.axes[0])
+def score_beneficiaries_reference(df):
+    """
+    Reference engine: goes through the claims row by row.
+    Outputs: beneficiaries <- dictionary of BENE_ID -> entry (see process_row)
+    """
     beneficiaries = dict()
     expired_beneficiaries = set()
     # Go row by row, process the data, and create a dictionary of beneficiaries with LACE scores and other important info
@@ -394,10 +499,122 @@ def process_dataframe(df):
             elif admsn_date > beneficiaries[bene_id]["admission_date"]:
                entry = process_row(row)
                beneficiaries[bene_id] = entry
-        
-    # Output patients LACE scores along with other pertinent information
+    return beneficiaries
+
+def score_beneficiaries_fast(df):
+    """
+    Fast engine: same results as score_beneficiaries_reference, but the lines are selected with vectorized operations
+    and only the line that ends up describing each beneficiary is processed (the other lines the reference engine processes
+    are only validated, so both engines reject the same files).
+
+    Semantics reproduced from the reference engine:
+    - lines with discharge status "Still a patient" or "Transferred" are skipped;
+    - once a beneficiary has a line with status "Expired", that line and all the following lines of the beneficiary are skipped
+      (the entry built from earlier lines is kept);
+    - each beneficiary is described by the first line with its latest admission date, and keeps the place of its first kept line;
+    - other lines with the same admission date change nothing (in the reference engine that branch fails on
+      beneficiaries["BENE_ID"] and only logs a warning, so acuity is not combined across lines);
+    - a line with a blank BENE_ID (NaN) never matches another line, since NaN != NaN, so each kept one is a beneficiary of its own.
+    """
+    positions = np.arange(len(df))
+    bene_ids = df["BENE_ID"]
+    # Every date is parsed by the reference engine, so invalid or missing dates must fail here too
+    admsn_dates = pd.to_datetime(df["CLM_ADMSN_DT"], format='%d-%b-%Y')
+    dschrg_dates = pd.to_datetime(df["NCH_BENE_DSCHRG_DT"], format='%d-%b-%Y')
+    if admsn_dates.isna().any() or dschrg_dates.isna().any():
+        raise ValueError("CLM_ADMSN_DT and NCH_BENE_DSCHRG_DT must be filled in on every line")
+
+    status = df["PTNT_DSCHRG_STUS_CD"]
+    expired = (status == PATIENT_DISCHARGE_STATUS_CODES["Expired"]).to_numpy()
+    skipped = status.isin([PATIENT_DISCHARGE_STATUS_CODES["Still a patient"],
+                           PATIENT_DISCHARGE_STATUS_CODES["Transferred to other inpatient hospital"]]).to_numpy()
+    first_expired = pd.Series(positions[expired]).groupby(bene_ids.to_numpy()[expired]).min()
+    after_expired = (bene_ids.map(first_expired) <= positions).to_numpy()
+    # Expired lines are skipped too (for a blank BENE_ID they are not "after" anything, but still skipped)
+    kept = ~skipped & ~after_expired & ~expired
+    validate_integers(status[kept], "PTNT_DSCHRG_STUS_CD")
+
+    # Blank BENE_IDs are left out of the grouping below and handled on their own
+    blank = bene_ids.isna().to_numpy()
+    grouped = kept & ~blank
+    lines = pd.DataFrame({"BENE_ID": bene_ids.to_numpy()[grouped], "admission_date": admsn_dates.to_numpy()[grouped], "position": positions[grouped]})
+    blank_positions = positions[kept & blank]
+    # The reference engine runs process_row on the first kept line of each beneficiary and on every line with a later
+    # admission than the kept lines before it, even if a later line replaces it, so those lines must be valid too.
+    latest_before = lines.groupby("BENE_ID")["admission_date"].cummax().groupby(lines["BENE_ID"]).shift()
+    processed = (latest_before.isna() | (lines["admission_date"] > latest_before)).to_numpy()
+    validate_processed_lines(df.iloc[np.concatenate([lines["position"].to_numpy()[processed], blank_positions])])
+
+    first = lines.groupby("BENE_ID", sort=False)["position"].min()
+    latest = lines.sort_values(["admission_date", "position"], ascending=[False, True]).drop_duplicates("BENE_ID")
+    latest = latest.set_index("BENE_ID")["position"].reindex(first.index)
+    # Beneficiaries in order of their first kept line, like the insertion order of the reference dictionary
+    selected = pd.Series(np.concatenate([latest.to_numpy(), blank_positions]), index=np.concatenate([first.to_numpy(), blank_positions]))
+    selected = selected.sort_index()
+
+    # ICD codes repeat a lot across beneficiaries, so look each one up only once
+    charlson_lookup = lru_cache(maxsize=None)(get_charlson_comorbidity)
+    beneficiaries = dict()
+    for index, row in df.iloc[selected.to_numpy()].iterrows():
+        beneficiaries[row["BENE_ID"]] = process_row(row, charlson_lookup)
+    return beneficiaries
+
+def validate_integers(values, column):
+    """
+    Raise ValueError if int() (which the reference engine applies to every scored line) fails on one of the values.
+    Only the distinct values are converted, as codes and counts take few of them.
+    """
+    for value in pd.unique(values):
+        try:
+            int(value)
+        except (TypeError, ValueError, OverflowError):
+            raise ValueError(column + " must be a number that int() accepts on every scored line, got " + repr(value))
+
+def validate_processed_lines(rows):
+    """
+    Vectorized version of the checks that process_row makes implicitly: raises ValueError if it would fail on one of the rows.
+    """
+    validate_integers(rows["Previous Emergency Dept Use (Past 6 Months)"], "Previous Emergency Dept Use (Past 6 Months)")
+
+    # acuity_of_admission: an admission type of 1 or 5 is enough, otherwise REV_CNTR is compared to numbers
+    # and, if it isn't an emergency department revenue center, HCPCS_CD is compared to strings.
+    if "CLM_IP_ADMSN_TYPE_CD" in rows.columns:
+        needs_rev_cntr = ~rows["CLM_IP_ADMSN_TYPE_CD"].isin([1, 5]).to_numpy()
+    else:
+        needs_rev_cntr = np.ones(len(rows), dtype=bool)
+    if not needs_rev_cntr.any():
+        return
+    rev_cntr = rows["REV_CNTR"][needs_rev_cntr]
+    if not rev_cntr.map(lambda value: isinstance(value, numbers.Number)).all():
+        raise ValueError("REV_CNTR must be a number on every scored line")
+    rev_cntr = rev_cntr.astype(float)
+    needs_hcpcs = ~(((rev_cntr >= 450) & (rev_cntr <= 459)) | (rev_cntr == 981)).to_numpy()
+    if not needs_hcpcs.any():
+        return
+    hcpcs = rows["HCPCS_CD"][needs_rev_cntr][needs_hcpcs]
+    if not hcpcs.map(lambda value: isinstance(value, str)).all():
+        raise ValueError("HCPCS_CD must be filled in on every scored line without an emergency admission type or revenue center")
+
+def score_beneficiaries(df, engine=SCORING_ENGINE):
+    """
+    Inputs: df <- claims dataframe; engine <- one of SCORING_ENGINES
+    Outputs: beneficiaries <- dictionary of BENE_ID -> entry (see process_row)
+    """
+    if engine == "reference":
+        return score_beneficiaries_reference(df)
+    elif engine == "fast":
+        return score_beneficiaries_fast(df)
+    raise ValueError("Unknown scoring engine " + str(engine) + ", expected one of " + str(SCORING_ENGINES))
+
+@st.cache_data
+def process_dataframe(df, engine=SCORING_ENGINE):
+    # Go through the claims, and create a dictionary of beneficiaries with LACE scores and other important info
+    beneficiaries = score_beneficiaries(df, engine)
+
+    # Output patients LACE scores along with other pertinent information, and the cohort cube aggregated from them
     df_new = convert_beneficiary_info_to_dataframe(beneficiaries)
-    return df_new
+    cube = build_cohort_cube(beneficiaries)
+    return df_new, cube
 
 def convert_df_to_csv(df):
     csv_buffer = StringIO()
@@ -417,12 +634,30 @@ def main():
     "'Try an example file' to use a pre-loaded dataset and view the LACE scores calculated by the app."
     )
 
-    df = upload_and_process_file()
+    df, warm_start_name = upload_and_process_file()
 
     progress= st.empty()
-    progress.info("Calculating patients' LACE scores. Depending on the file size \
-                   and internet connection, this might take up to 30+ seconds.")
-    df_new = process_dataframe(df)
+    if warm_start_name is not None:
+        df_new = load_warm_start_dataset(warm_start_name, "scored")
+        cube = load_warm_start_dataset(warm_start_name, "cube")
+    else:
+        progress.info("Calculating patients' LACE scores. Depending on the file size \
+                       and internet connection, this might take up to 30+ seconds.")
+        df_new, cube = process_dataframe(df)
+
+        # Save the scores of uploaded files (not the example file) to the store used by the Beneficiary Score Lookup page,
+        # once per upload: Streamlit reruns this page while the file stays in the uploader.
+        # Done outside process_dataframe so it also happens when the scores come from Streamlit's cache.
+        upload_id = st.session_state["claims_upload"].file_id
+        if st.session_state.get("saved_upload_id") != upload_id:
+            try:
+                upsert_scores(df_new)
+                st.session_state["saved_upload_id"] = upload_id
+            except Exception as e:
+                logging.warning(e)
+                st.warning("The LACE scores could not be saved for the Beneficiary Score Lookup page: " + str(e))
+    # Keep the cube for the Cohort Dashboard page
+    st.session_state["cohort_cube"] = cube
 
     # Display on Streamlit
     display_beneficiaries_dataframe(df_new)
@@ -0,0 +1,95 @@
+import streamlit as st
+from cohort_cube import COHORT_CUBE_ALL, COHORT_CUBE_NO_COMORBIDITY
+
+RISK_BANDS = ["LOW", "INTERMEDIATE", "HIGH"]
+
+def get_cohort_cube():
+    """
+    Return the cohort cube of the last scored claims file in this session, or None if nothing has been scored yet.
+    """
+    return st.session_state.get("cohort_cube")
+
+def filter_cube(cube, months, risk_bands):
+    """
+    Inputs: cube <- cohort cube; months <- (first, last) discharge month; risk_bands <- risk bands to keep
+    Outputs: the cells of the cube within the selection
+    """
+    first_month, last_month = months
+    in_months = (cube["Discharge Month"] >= first_month) & (cube["Discharge Month"] <= last_month)
+    in_bands = cube["30-Day Readmission Risk"].isin(risk_bands)
+    return cube[in_months & in_bands]
+
+def high_risk_share_by_month(cube):
+    """
+    Share of beneficiaries with HIGH 30-day readmission risk, by discharge month.
+    """
+    cube = cube[cube["Comorbidity"] == COHORT_CUBE_ALL]
+    total = cube.groupby("Discharge Month")["Beneficiaries"].sum()
+    high = cube[cube["30-Day Readmission Risk"] == "HIGH"].groupby("Discharge Month")["Beneficiaries"].sum()
+    share = high.reindex(total.index, fill_value=0) / total
+    return share.rename("High-Risk Share")
+
+def mean_charlson_by_comorbidity(cube):
+    """
+    Mean Charlson comorbidity index of the beneficiaries having each comorbidity category
+    (beneficiaries without any comorbidity are left out).
+    """
+    cube = cube[~cube["Comorbidity"].isin([COHORT_CUBE_ALL, COHORT_CUBE_NO_COMORBIDITY])]
+    sums = cube.groupby("Comorbidity")[["Comorbidity Index Sum", "Beneficiaries"]].sum()
+    mean = sums["Comorbidity Index Sum"] / sums["Beneficiaries"]
+    return mean.rename("Mean Comorbidity Index").sort_values(ascending=False)
+
+def acute_admissions_by_risk_band(cube):
+    """
+    Number of acute/emergent and non-acute admissions in each risk band.
+    """
+    cube = cube[cube["Comorbidity"] == COHORT_CUBE_ALL]
+    counts = cube.pivot_table(index="30-Day Readmission Risk", columns="Admission Is Acute", values="Beneficiaries", aggfunc="sum", fill_value=0)
+    counts = counts.reindex(index=[band for band in RISK_BANDS if band in counts.index])
+    counts.columns = ["Acute" if acute else "Not Acute" for acute in counts.columns]
+    return counts
+
+def main():
+    st.title("Cohort Risk Dashboard")
+    st.markdown(
+    "Population-level view of the last claims file scored on the **Calculate LACE from Claims Data** page. "
+    "The charts are computed from a pre-aggregated cube (counts and sums by discharge month, risk band, "
+    "acuity and comorbidity category), so they do not depend on the number of beneficiaries."
+    )
+
+    cube = get_cohort_cube()
+    if cube is None or len(cube) == 0:
+        st.info("No scored claims yet. Upload a claims file (or try the example file) on the Calculate LACE from Claims Data page first.")
+        return
+
+    months = sorted(cube["Discharge Month"].unique())
+    if len(months) > 1:
+        selected_months = st.select_slider("Discharge months", options=months, value=(months[0], months[-1]))
+    else:
+        selected_months = (months[0], months[0])
+    risk_bands = st.multiselect("30-Day Readmission Risk", RISK_BANDS, default=RISK_BANDS)
+    # The high-risk share needs every risk band in its denominator, so it only follows the month selection
+    month_cube = filter_cube(cube, selected_months, RISK_BANDS)
+    cube = filter_cube(cube, selected_months, risk_bands)
+
+    all_cells = cube[cube["Comorbidity"] == COHORT_CUBE_ALL]
+    beneficiaries = int(all_cells["Beneficiaries"].sum())
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Beneficiaries", beneficiaries)
+    if beneficiaries > 0:
+        col2.metric("Mean LACE Score", round(all_cells["LACE Score Sum"].sum() / beneficiaries, 2))
+        col3.metric("Acute Admissions", int(all_cells[all_cells["Admission Is Acute"]]["Beneficiaries"].sum()))
+
+    st.subheader("High-risk share by discharge month", help="Share of all the beneficiaries discharged in the month, whatever risk bands are selected.")
+    st.line_chart(high_risk_share_by_month(month_cube))
+    if beneficiaries == 0:
+        return
+
+    st.subheader("Mean comorbidity index by comorbidity")
+    st.bar_chart(mean_charlson_by_comorbidity(cube))
+
+    st.subheader("Acute admissions by risk band")
+    st.bar_chart(acute_admissions_by_risk_band(cube))
+
+if __name__ == '__main__':
+    main()
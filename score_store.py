@@ -0,0 +1,120 @@
+import sqlite3
+import json
+from contextlib import closing
+from datetime import datetime
+import pandas as pd
+
+# Local SQLite store of the latest LACE score of each beneficiary, filled from the scoring runs of the claims page
+SCORE_STORE_PATH = "beneficiary_scores.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS beneficiary_scores (
+    bene_id TEXT PRIMARY KEY,
+    discharge_date TEXT NOT NULL,
+    lace_score INTEGER NOT NULL,
+    readmission_risk TEXT NOT NULL,
+    admission_is_acute INTEGER NOT NULL,
+    comorbidity_index INTEGER NOT NULL,
+    ed_visits INTEGER NOT NULL,
+    comorbidities TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_beneficiary_scores_lace ON beneficiary_scores (lace_score);
+CREATE INDEX IF NOT EXISTS idx_beneficiary_scores_discharge ON beneficiary_scores (discharge_date);
+CREATE INDEX IF NOT EXISTS idx_beneficiary_scores_risk_discharge ON beneficiary_scores (readmission_risk, discharge_date);
+"""
+
+# A beneficiary's score is only replaced by one from the same or a later discharge, so rescoring an older file doesn't overwrite newer scores.
+UPSERT = """
+INSERT INTO beneficiary_scores (bene_id, discharge_date, lace_score, readmission_risk, admission_is_acute,
+                                comorbidity_index, ed_visits, comorbidities, updated_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (bene_id) DO UPDATE SET
+    discharge_date = excluded.discharge_date,
+    lace_score = excluded.lace_score,
+    readmission_risk = excluded.readmission_risk,
+    admission_is_acute = excluded.admission_is_acute,
+    comorbidity_index = excluded.comorbidity_index,
+    ed_visits = excluded.ed_visits,
+    comorbidities = excluded.comorbidities,
+    updated_at = excluded.updated_at
+WHERE excluded.discharge_date >= beneficiary_scores.discharge_date
+"""
+
+# Columns returned by lookups, named like the scored dataframe of the claims page
+SELECT = """
+SELECT bene_id AS "Beneficiary ID", lace_score AS "LACE Score", readmission_risk AS "30-Day Readmission Risk",
+       admission_is_acute AS "Admission Is Acute", comorbidity_index AS "Comorbidity Index",
+       ed_visits AS "Previous Emergency Dept Use (Past 6 Months)", discharge_date AS "Discharge Date",
+       comorbidities AS "Comorbidities", updated_at AS "Updated At"
+FROM beneficiary_scores
+"""
+
+def connect(path=SCORE_STORE_PATH):
+    """
+    Open the store (creating the table and indexes if needed).
+    """
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    return conn
+
+def upsert_scores(df, path=SCORE_STORE_PATH):
+    """
+    Inputs: df <- scored dataframe from the claims page (one row per beneficiary)
+    Behavior: inserts the beneficiaries that are new to the store and updates the others, in a single transaction.
+    Returns the number of rows written.
+    """
+    updated_at = datetime.now().isoformat(timespec="seconds")
+    rows = [(str(bene_id), pd.Timestamp(discharge_date).strftime("%Y-%m-%d"), int(lace_score), risk, int(bool(acute)),
+             int(charlson_score), int(ed_visits), json.dumps([str(c) for c in comorbidities]), updated_at)
+            for bene_id, discharge_date, lace_score, risk, acute, charlson_score, ed_visits, comorbidities
+            in zip(df["Beneficiary ID"], df["Discharge Date"], df["LACE Score"], df["30-Day Readmission Risk"],
+                   df["Admission Is Acute"], df["Comorbidity Index"], df["Previous Emergency Dept Use (Past 6 Months)"],
+                   df["Comorbidities"])]
+    with closing(connect(path)) as conn:
+        with conn:
+            conn.executemany(UPSERT, rows)
+    return len(rows)
+
+def _read(query, params, path):
+    with closing(connect(path)) as conn:
+        df = pd.read_sql_query(query, conn, params=params)
+    df["Admission Is Acute"] = df["Admission Is Acute"].astype(bool)
+    df["Comorbidities"] = df["Comorbidities"].map(json.loads)
+    return df
+
+def get_beneficiary(bene_id, path=SCORE_STORE_PATH):
+    """
+    Point lookup on the primary key. Returns a one-row dataframe, or an empty one if the beneficiary isn't in the store.
+    """
+    return _read(SELECT + " WHERE bene_id = ?", [str(bene_id)], path)
+
+def query_scores(risk_levels=None, discharged_from=None, discharged_to=None, min_lace=None, max_lace=None, limit=10000, path=SCORE_STORE_PATH):
+    """
+    Range query, e.g. all HIGH risk discharges between two dates. Every filter is optional (None); dates are inclusive.
+    An empty list of risk levels matches nothing.
+    Results are ordered by discharge date (latest first) and then by LACE score.
+    """
+    conditions, params = [], []
+    if risk_levels is not None:
+        # SQLite accepts an empty "IN ()", which is always false
+        conditions.append("readmission_risk IN (" + ", ".join("?" * len(risk_levels)) + ")")
+        params += list(risk_levels)
+    if discharged_from is not None:
+        conditions.append("discharge_date >= ?")
+        params.append(pd.Timestamp(discharged_from).strftime("%Y-%m-%d"))
+    if discharged_to is not None:
+        conditions.append("discharge_date <= ?")
+        params.append(pd.Timestamp(discharged_to).strftime("%Y-%m-%d"))
+    if min_lace is not None:
+        conditions.append("lace_score >= ?")
+        params.append(int(min_lace))
+    if max_lace is not None:
+        conditions.append("lace_score <= ?")
+        params.append(int(max_lace))
+    query = SELECT
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY discharge_date DESC, lace_score DESC LIMIT ?"
+    params.append(int(limit))
+    return _read(query, params, path)
@@ -0,0 +1,51 @@
+import unittest
+from datetime import datetime
+from cohort_cube import build_cohort_cube, COHORT_CUBE_ALL, COHORT_CUBE_NO_COMORBIDITY
+
+class TestCohortCube(unittest.TestCase):
+
+    def setUp(self):
+        # Entries shaped like the ones process_row returns (only the fields the cube uses)
+        self.beneficiaries = {
+            "A": {"discharge_date": datetime(2020, 1, 10), "readmission_risk": "HIGH", "acuity": True,
+                  "comorbidities": ["Heart failure", "Dementia"], "LACE_score": 14, "charlson_score": 5, "emergency_dept_use": 3},
+            "B": {"discharge_date": datetime(2020, 1, 20), "readmission_risk": "HIGH", "acuity": True,
+                  "comorbidities": ["Heart failure"], "LACE_score": 11, "charlson_score": 2, "emergency_dept_use": 2},
+            "C": {"discharge_date": datetime(2020, 2, 5), "readmission_risk": "LOW", "acuity": False,
+                  "comorbidities": [], "LACE_score": 2, "charlson_score": 0, "emergency_dept_use": 1},
+        }
+        self.cube = build_cohort_cube(self.beneficiaries)
+
+    def cell(self, month, risk, acute, comorbidity):
+        cells = self.cube[(self.cube["Discharge Month"] == month) & (self.cube["30-Day Readmission Risk"] == risk)
+                          & (self.cube["Admission Is Acute"] == acute) & (self.cube["Comorbidity"] == comorbidity)]
+        self.assertEqual(len(cells), 1)
+        return cells.iloc[0]
+
+    def test_all_rows_count_each_beneficiary_once(self):
+        all_cells = self.cube[self.cube["Comorbidity"] == COHORT_CUBE_ALL]
+        self.assertEqual(all_cells["Beneficiaries"].sum(), len(self.beneficiaries))
+        self.assertEqual(all_cells["LACE Score Sum"].sum(), sum(entry["LACE_score"] for entry in self.beneficiaries.values()))
+        self.assertEqual(all_cells["Comorbidity Index Sum"].sum(), sum(entry["charlson_score"] for entry in self.beneficiaries.values()))
+        self.assertEqual(all_cells["Previous Emergency Dept Use Sum"].sum(), sum(entry["emergency_dept_use"] for entry in self.beneficiaries.values()))
+        cell = self.cell("2020-01", "HIGH", True, COHORT_CUBE_ALL)
+        self.assertEqual(cell["Beneficiaries"], 2)
+        self.assertEqual(cell["LACE Score Sum"], 25)
+
+    def test_beneficiary_without_comorbidities_goes_under_none(self):
+        cell = self.cell("2020-02", "LOW", False, COHORT_CUBE_NO_COMORBIDITY)
+        self.assertEqual(cell["Beneficiaries"], 1)
+        self.assertEqual(cell["LACE Score Sum"], 2)
+        self.assertEqual(len(self.cube[self.cube["Discharge Month"] == "2020-02"]), 2) # All + None
+
+    def test_beneficiary_counted_once_per_comorbidity(self):
+        heart_failure = self.cell("2020-01", "HIGH", True, "Heart failure")
+        self.assertEqual(heart_failure["Beneficiaries"], 2)
+        self.assertEqual(heart_failure["Comorbidity Index Sum"], 7)
+        dementia = self.cell("2020-01", "HIGH", True, "Dementia")
+        self.assertEqual(dementia["Beneficiaries"], 1)
+        self.assertEqual(dementia["LACE Score Sum"], 14)
+        self.assertNotIn(COHORT_CUBE_NO_COMORBIDITY, self.cube[self.cube["Discharge Month"] == "2020-01"]["Comorbidity"].tolist())
+
+if __name__ == '__main__':
+    unittest.main()
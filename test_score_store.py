@@ -0,0 +1,80 @@
+import unittest
+import os
+import shutil
+import tempfile
+from datetime import datetime
+import pandas as pd
+from score_store import upsert_scores, get_beneficiary, query_scores
+
+class TestScoreStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "beneficiary_scores.db")
+        upsert_scores(self.scored([
+            ("1", "01-Mar-2020", 12, "HIGH", True, 3, 2, ["Heart failure", "Myocardial infarction"]),
+            ("2", "05-Mar-2020", 7, "INTERMEDIATE", False, 1, 1, ["Cerebrovascular disease"]),
+            ("3", "08-Mar-2020", 10, "HIGH", True, 2, 0, []),
+            ("4", "20-Mar-2020", 3, "LOW", False, 0, 1, []),
+        ]), self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def scored(self, rows):
+        """
+        Build a dataframe shaped like the scored dataframe of the claims page.
+        """
+        columns = ["Beneficiary ID", "Discharge Date", "LACE Score", "30-Day Readmission Risk", "Admission Is Acute",
+                   "Comorbidity Index", "Previous Emergency Dept Use (Past 6 Months)", "Comorbidities"]
+        rows = [(bene_id, datetime.strptime(date, '%d-%b-%Y')) + tuple(rest) for bene_id, date, *rest in rows]
+        return pd.DataFrame(rows, columns=columns)
+
+    def test_upsert_inserts_new_beneficiaries(self):
+        self.assertEqual(len(query_scores(path=self.path)), 4)
+        self.assertEqual(upsert_scores(self.scored([("5", "02-Apr-2020", 4, "LOW", False, 0, 0, [])]), self.path), 1)
+        self.assertEqual(len(query_scores(path=self.path)), 5)
+
+    def test_upsert_replaces_same_or_later_discharge(self):
+        upsert_scores(self.scored([("1", "01-Mar-2020", 13, "HIGH", True, 4, 2, ["Dementia"]),
+                                   ("2", "10-Apr-2020", 4, "LOW", False, 0, 0, [])]), self.path)
+        bene_1 = get_beneficiary("1", self.path).iloc[0]
+        self.assertEqual(bene_1["LACE Score"], 13)
+        self.assertEqual(bene_1["Comorbidities"], ["Dementia"])
+        bene_2 = get_beneficiary("2", self.path).iloc[0]
+        self.assertEqual(bene_2["LACE Score"], 4)
+        self.assertEqual(bene_2["Discharge Date"], "2020-04-10")
+        self.assertEqual(len(query_scores(path=self.path)), 4)
+
+    def test_upsert_keeps_entry_when_discharge_is_older(self):
+        upsert_scores(self.scored([("3", "01-Jan-2020", 2, "LOW", False, 0, 0, [])]), self.path)
+        bene_3 = get_beneficiary("3", self.path).iloc[0]
+        self.assertEqual(bene_3["LACE Score"], 10)
+        self.assertEqual(bene_3["Discharge Date"], "2020-03-08")
+
+    def test_get_beneficiary(self):
+        hit = get_beneficiary("1", self.path)
+        self.assertEqual(len(hit), 1)
+        self.assertEqual(hit.iloc[0]["30-Day Readmission Risk"], "HIGH")
+        self.assertTrue(hit.iloc[0]["Admission Is Acute"])
+        self.assertEqual(sorted(hit.iloc[0]["Comorbidities"]), ["Heart failure", "Myocardial infarction"])
+        self.assertEqual(len(get_beneficiary("99", self.path)), 0)
+
+    def test_query_scores_date_bounds_are_inclusive(self):
+        df = query_scores(discharged_from="2020-03-05", discharged_to="2020-03-08", path=self.path)
+        self.assertEqual(sorted(df["Beneficiary ID"]), ["2", "3"])
+
+    def test_query_scores_lace_bounds_are_inclusive(self):
+        df = query_scores(min_lace=7, max_lace=10, path=self.path)
+        self.assertEqual(sorted(df["Beneficiary ID"]), ["2", "3"])
+
+    def test_query_scores_risk_filter(self):
+        df = query_scores(risk_levels=["HIGH"], path=self.path)
+        self.assertEqual(df["Beneficiary ID"].tolist(), ["3", "1"]) # Latest discharge first
+        df = query_scores(risk_levels=["LOW", "INTERMEDIATE"], discharged_to="2020-03-10", path=self.path)
+        self.assertEqual(df["Beneficiary ID"].tolist(), ["2"])
+        self.assertEqual(len(query_scores(risk_levels=[], path=self.path)), 0)
+        self.assertEqual(len(query_scores(risk_levels=None, path=self.path)), 4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+from unittest import mock
+import os
+import shutil
+import tempfile
+import pandas as pd
+from compare_engines import load_claims_page, generate_claims
+
+class TestWarmStart(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.claims_page = load_claims_page()
+
+    def setUp(self):
+        # Register a generated claims file as a warm start dataset, with its artifacts in a temporary WARM_START_DIR
+        self.tmp_dir = tempfile.mkdtemp()
+        self.warm_start_dir = os.path.join(self.tmp_dir, "warm_start")
+        self.claims_path = os.path.join(self.tmp_dir, "claims.csv")
+        df = generate_claims(50, seed=1)
+        df["HCPCS_CD"] = "G0378" # Keeps HCPCS_CD a string column when the CSV is read back
+        df.to_csv(self.claims_path, sep="|", index=False)
+
+        self.patchers = [mock.patch.object(self.claims_page, "WARM_START_DIR", self.warm_start_dir),
+                         mock.patch.dict(self.claims_page.WARM_START_DATASETS, {"test": self.claims_path})]
+        for patcher in self.patchers:
+            patcher.start()
+        self.paths = self.claims_page.warm_start_paths("test")
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def set_mtime(self, path, mtime):
+        os.utime(path, (mtime, mtime))
+
+    def test_missing_artifacts_are_stale(self):
+        self.assertTrue(self.claims_page.warm_start_is_stale("test"))
+        self.claims_page.build_warm_start_dataset("test")
+        self.assertFalse(self.claims_page.warm_start_is_stale("test"))
+        os.remove(self.paths["cube"])
+        self.assertTrue(self.claims_page.warm_start_is_stale("test"))
+
+    def test_artifacts_older_than_claims_are_stale(self):
+        self.claims_page.build_warm_start_dataset("test")
+        mtime = os.path.getmtime(self.claims_path)
+        for path in self.paths.values():
+            self.set_mtime(path, mtime + 10)
+        self.assertFalse(self.claims_page.warm_start_is_stale("test"))
+        self.set_mtime(self.paths["scored"], mtime - 10)
+        self.assertTrue(self.claims_page.warm_start_is_stale("test"))
+
+    def test_build_leaves_no_temporary_files(self):
+        self.claims_page.build_warm_start_dataset("test")
+        self.assertEqual(sorted(os.listdir(self.warm_start_dir)), sorted(os.path.basename(path) for path in self.paths.values()))
+
+    def test_interrupted_build_keeps_previous_artifacts(self):
+        self.claims_page.build_warm_start_dataset("test")
+        contents = dict()
+        for artifact, path in self.paths.items():
+            with open(path, "rb") as f:
+                contents[artifact] = f.read()
+
+        def truncated_write(df, path, **kwargs):
+            with open(path, "wb") as f:
+                f.write(b"ARROW1")
+            raise OSError("No space left on device")
+
+        with mock.patch.object(self.claims_page.feather, "write_feather", side_effect=truncated_write):
+            with self.assertRaises(OSError):
+                self.claims_page.build_warm_start_dataset("test")
+
+        for artifact, path in self.paths.items():
+            with open(path, "rb") as f:
+                self.assertEqual(f.read(), contents[artifact])
+        self.assertEqual(sorted(os.listdir(self.warm_start_dir)), sorted(os.path.basename(path) for path in self.paths.values()))
+
+    def test_load_matches_scored_dataframe(self):
+        df = pd.read_csv(self.claims_path, sep="|", low_memory = False)
+        df_new, cube = self.claims_page.process_dataframe(self.claims_page.select_claims_columns(df))
+        loaded = self.claims_page.load_warm_start_dataset("test", "scored")
+        pd.testing.assert_frame_equal(loaded, df_new)
+        self.assertTrue(all(isinstance(comorbidities, list) for comorbidities in loaded["Comorbidities"]))
+        pd.testing.assert_frame_equal(self.claims_page.load_warm_start_dataset("test", "cube"), cube)
+
+    def test_load_returns_a_new_dataframe(self):
+        loaded = self.claims_page.load_warm_start_dataset("test", "scored")
+        expected = loaded["LACE Score"].tolist()
+        loaded["LACE Score"] = -1
+        loaded["Comorbidities"][0].append("Not a comorbidity")
+        reloaded = self.claims_page.load_warm_start_dataset("test", "scored")
+        self.assertEqual(reloaded["LACE Score"].tolist(), expected)
+        self.assertNotIn("Not a comorbidity", reloaded["Comorbidities"][0])
+
+if __name__ == '__main__':
+    unittest.main()